@@ -2,13 +2,18 @@ import os
 import re
 import shutil
 import argparse
-import cv2
-import numpy as np
-from ultralytics import YOLO
+import mmap
+from jpg2png import convert_jpg_to_png_overwrite  # Kept there so pool workers only import PIL
+
+# images.txt edits, applied in a single pass:
+#   .jpg / .JPG        -> .png
+#   ' <number> pano'   -> ' 1 pano'
+#   '/'                -> '_'
+_IMAGES_TXT_RE = re.compile(rb'\.jpg|\.JPG|\s\d+\s+pano|/')
 
 def merge_pano_images(src_root, dst_root, camera_count=12):
     """
-    Copy images from pano_camera{i} folders inside src_root
+    Move images from pano_camera{i} folders inside src_root
     into dst_root, and rename them as pano_camera{i}_originalFilename.
     After merging, delete the original pano_camera folders.
     """
@@ -26,13 +31,18 @@ def merge_pano_images(src_root, dst_root, camera_count=12):
             print(f"⚠️ Folder not found: {src_dir}")
             continue
 
-        # Iterate through images inside this folder
-        for file_name in os.listdir(src_dir):
-            src_path = os.path.join(src_dir, file_name)
-            if os.path.isfile(src_path):
-                new_name = f"pano_camera{i}_{file_name}"
-                dst_path = os.path.join(dst_root, new_name)
-                shutil.copy2(src_path, dst_path)
+        # List images inside this folder before moving them out of it
+        with os.scandir(src_dir) as it:
+            entries = [e for e in it if e.is_file()]
+
+        for entry in entries:
+            new_name = f"pano_camera{i}_{entry.name}"
+            dst_path = os.path.join(dst_root, new_name)
+            try:
+                os.rename(entry.path, dst_path)
+            except OSError:
+                # rename fails across filesystems; fall back to copying
+                shutil.copy2(entry.path, dst_path)
 
         print(f"✅ Processed folder: pano_camera{i}")
         processed_folders.append(src_dir)
@@ -48,24 +58,14 @@ def merge_pano_images(src_root, dst_root, camera_count=12):
 
     print(f"\n🎉 Completed! Merged images saved in: {dst_root}")
 
-def replace_ext_jpg_to_png(content):
-    """Replace all .jpg / .JPG with .png"""
-    content = content.replace(".jpg", ".png")
-    content = content.replace(".JPG", ".png")
-    return content
-
-def modify_pano_ids(content):
-    """
-    Replace any pattern ' <number> pano' to ' 1 pano'
-    Pattern: whitespace + digits + whitespace + pano
-    """
-    pattern = r'\s(\d+)\s+pano'
-    replacement = r' 1 pano'
-    return re.sub(pattern, replacement, content)
-
-def replace_frame(content):
-    """Replace all '/frame' with '_frame'"""
-    return content.replace('/', '_')
+def _images_txt_replacement(match):
+    """Replacement for one _IMAGES_TXT_RE match"""
+    token = match.group(0)
+    if token == b'/':
+        return b'_'         # '/frame' -> '_frame'
+    if token.endswith(b'pano'):
+        return b' 1 pano'   # ' <number> pano' -> ' 1 pano'
+    return b'.png'          # .jpg / .JPG -> .png
 
 def process_images_txt(file_path):
     """Run all modification steps on the given images.txt file"""
@@ -75,69 +75,29 @@ def process_images_txt(file_path):
 
     print(f"📌 Processing file: {file_path}")
 
-    # Read file content
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Apply all modifications
-    content = replace_ext_jpg_to_png(content)
-    content = modify_pano_ids(content)
-    content = replace_frame(content)
+    if os.path.getsize(file_path) == 0:
+        print("🎉 All replacements completed!")
+        return
 
-    # Write updated content back to file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    # Scan the memory-mapped file in one pass, streaming the unchanged spans
+    # and replacements into a temp file (memory use doesn't grow with file size)
+    tmp_path = file_path + ".tmp"
+    with open(file_path, 'rb') as src, \
+            mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            open(tmp_path, 'wb') as dst:
+        last = 0
+        for match in _IMAGES_TXT_RE.finditer(mm):
+            dst.write(mm[last:match.start()])
+            dst.write(_images_txt_replacement(match))
+            last = match.end()
+        dst.write(mm[last:])
+
+    # Swap the updated file into place
+    os.replace(tmp_path, file_path)
 
     print("🎉 All replacements completed!")
 
 
-# Load YOLOv8 segmentation model (auto-download if not available)
-model = YOLO("yolo11x-seg.pt")  # Model supports instance segmentation
-
-def person_mask(image_path, save_path="mask.png"):
-    # Read image
-    img = cv2.imread(image_path)
-    h, w = img.shape[:2]
-
-    # Run inference
-    results = model(img)
-
-    # Initialize mask: background = 1, person = 0
-    final_mask = np.ones((h, w), dtype=np.uint8)
-
-    for r in results:
-        if r.masks is not None:
-            for cls, mask in zip(r.boxes.cls, r.masks.data):
-                if int(cls) == 0:  # COCO class 0 = person
-                    m = mask.cpu().numpy()
-                    m = cv2.resize(m, (w, h))  # Resize mask to original image size
-                    m = (m > 0.5).astype(np.uint8)
-
-                    # Set person region to 0
-                    final_mask[m == 1] = 0
-
-    # Save mask image (0 = black for person, 255 = white for background)
-    cv2.imwrite(save_path, final_mask * 255)
-
-    return final_mask
-
-def process_images_in_folder(input_folder, output_folder):
-    # Ensure output folder exists
-    os.makedirs(output_folder, exist_ok=True)
-
-    # Iterate through all files in the folder
-    for filename in os.listdir(input_folder):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):  # Only process image files
-            image_path = os.path.join(input_folder, filename)
-            mask_filename = f"mask_{filename}"
-            save_path = os.path.join(output_folder, mask_filename)
-
-            # Generate segmentation mask
-            print(f"Processing {filename}...")
-            person_mask(image_path, save_path)
-
-    print("All masks are generated and saved.")
-
 def keep_first_four_cameras(file_path):
     if not os.path.exists(file_path):
         print(f"❌ File does not exist: {file_path}")
@@ -160,31 +120,6 @@ def keep_first_four_cameras(file_path):
 
     print("✅ cameras.txt updated: Only CAMERA_ID = 1 is kept.")
 
-def convert_jpg_to_png_overwrite(input_dir):
-    """
-    Convert all .jpg/.jpeg images in input_dir to .png format,
-    and delete the original .jpg/.jpeg files.
-    """
-
-    for file in os.listdir(input_dir):
-        if file.lower().endswith((".jpg", ".jpeg")):
-            src_path = os.path.join(input_dir, file)
-            png_name = os.path.splitext(file)[0] + ".png"
-            dst_path = os.path.join(input_dir, png_name)
-
-            try:
-                img = Image.open(src_path).convert("RGB")
-                img.save(dst_path, "PNG")
-                print(f"[OK] {file} → {png_name}")
-
-                os.remove(src_path)
-                print(f"[DEL] Removed original: {file}")
-
-            except Exception as e:
-                print(f"[ERROR] Failed to convert {file}: {e}")
-
-    print("\n🎉 Overwrite conversion completed!")
-
 
 def main():
     # prepare base dir 
@@ -204,6 +139,17 @@ def main():
         required=True,
         help="Root directory, e.g., C:\\Users\\TSingSV\\Desktop\\datas\\720_process"
     )
+    parser.add_argument(
+        "--mask_server",
+        type=str,
+        default=None,
+        help="host:port of a running mask_server.py; reuses its warm model instead of loading one"
+    )
+    parser.add_argument(
+        "--reencode",
+        action="store_true",
+        help="Save images as real PNG files instead of only renaming the JPEGs"
+    )
 
     args = parser.parse_args()
 
@@ -228,7 +174,7 @@ def main():
     camera_txt = os.path.join(root, "sparse", "0", "cameras.txt")
     os.makedirs(depths_dir, exist_ok=True)
 
-    convert_jpg_to_png_overwrite(images_dir)
+    convert_jpg_to_png_overwrite(images_dir, reencode=args.reencode)
 
     keep_first_four_cameras(camera_txt)
 
@@ -236,8 +182,13 @@ def main():
     merge_pano_images(images_dir, images_dir)
     process_images_txt(images_txt)
 
-    # Mask Generation
-    process_images_in_folder(images_dir, masks_dir)
+    # Mask Generation (imported lazily: the --mask_server path never loads torch/ultralytics)
+    if args.mask_server:
+        from mask_server import request_masks
+        request_masks(images_dir, masks_dir, args.mask_server)
+    else:
+        from person_mask import process_images_in_folder
+        process_images_in_folder(images_dir, masks_dir)
 
     print("🎉 ALL DONE!")
 
@@ -1,24 +1,54 @@
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 
-def convert_jpg_to_png_overwrite(input_dir):
+JPG_EXTENSIONS = (".jpg", ".jpeg")
+
+def _convert_one_jpg_to_png(src_path):
+    """Convert a single .jpg/.jpeg to .png next to it, then delete the original."""
+    dst_path = os.path.splitext(src_path)[0] + ".png"
+    img = Image.open(src_path).convert("RGB")
+    img.save(dst_path, "PNG", compress_level=1)  # Fast zlib level; pixels are identical
+    os.remove(src_path)
+
+def convert_jpg_to_png_overwrite(input_dir, reencode=False):
     """
-    Convert all .jpg/.jpeg images in input_dir to .png format,
-    and delete the original .jpg/.jpeg files.
+    Give all .jpg/.jpeg images in input_dir a .png name, replacing the originals.
+
+    By default the files are only renamed: the JPEG bytes are kept, and
+    readers (PIL, OpenCV, COLMAP) detect the format from the file header.
+    With reencode=True the images are decoded and saved as real PNG files.
     """
 
-    for file in os.listdir(input_dir):
-        if file.lower().endswith((".jpg", ".jpeg")):
-            src_path = os.path.join(input_dir, file)
+    # List the folder once up front, since the loop adds and removes files in it
+    with os.scandir(input_dir) as it:
+        entries = [e for e in it if e.name.lower().endswith(JPG_EXTENSIONS)]
+
+    if not reencode:
+        for entry in entries:
+            png_name = os.path.splitext(entry.name)[0] + ".png"
+            try:
+                os.replace(entry.path, os.path.join(input_dir, png_name))
+                print(f"[OK] {entry.name} → {png_name}")
+            except OSError as e:
+                print(f"[ERROR] Failed to rename {entry.name}: {e}")
+
+        print("\n🎉 Overwrite conversion completed!")
+        return
+
+    # Decoding/encoding is CPU-bound, so convert files in parallel processes
+    # (default worker count: os.cpu_count(), capped at 61 on Windows)
+    with ProcessPoolExecutor() as pool:
+        futures = [pool.submit(_convert_one_jpg_to_png, entry.path) for entry in entries]
+
+        for entry, future in zip(entries, futures):
+            file = entry.name
             png_name = os.path.splitext(file)[0] + ".png"
-            dst_path = os.path.join(input_dir, png_name)
 
             try:
-                img = Image.open(src_path).convert("RGB")
-                img.save(dst_path, "PNG")
+                future.result()
                 print(f"[OK] {file} → {png_name}")
-
-                os.remove(src_path)
                 print(f"[DEL] Removed original: {file}")
 
             except Exception as e:
@@ -28,5 +58,19 @@ def convert_jpg_to_png_overwrite(input_dir):
 
 
 if __name__ == "__main__":
-    input_folder = r"C:\\Users\\TSingSV\\Desktop\\datas\\Supermarket\\516_process_no_mask\\images"
-    convert_jpg_to_png_overwrite(input_folder)
+    parser = argparse.ArgumentParser(description="Give .jpg/.jpeg images a .png name, replacing the originals.")
+    parser.add_argument(
+        "--input_dir",
+        type=str,
+        default=r"C:\\Users\\TSingSV\\Desktop\\datas\\Supermarket\\516_process_no_mask\\images",
+        help="Folder with the images to convert"
+    )
+    parser.add_argument(
+        "--reencode",
+        action="store_true",
+        help="Decode and save real PNG files instead of only renaming"
+    )
+
+    args = parser.parse_args()
+
+    convert_jpg_to_png_overwrite(args.input_dir, reencode=args.reencode)
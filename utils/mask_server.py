@@ -0,0 +1,112 @@
+import os
+import argparse
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+# ================= DEFAULT CONFIGURATION =================
+DEFAULT_ADDRESS = "localhost:6000"
+# Environment variable holding the secret shared by server and clients
+AUTHKEY_ENV = "GUSSIAN_MASK_AUTHKEY"
+# =======================================================
+
+def get_authkey():
+    """
+    Reads the connection secret from GUSSIAN_MASK_AUTHKEY. There is no default:
+    messages are pickled, so anyone who knows the key can run code as the server's user.
+    """
+    key = os.environ.get(AUTHKEY_ENV)
+    if not key:
+        raise RuntimeError(f"{AUTHKEY_ENV} is not set; export a private secret for both server and clients "
+                           f"(e.g. {AUTHKEY_ENV}=$(openssl rand -hex 32)).")
+    return key.encode()
+
+def parse_address(address):
+    """Parses 'host:port' into a (host, port) tuple."""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+def request_masks(input_folder, output_folder, address=DEFAULT_ADDRESS):
+    """
+    Asks a running mask server to generate masks for input_folder.
+    The server writes the masks to output_folder itself, so only paths cross the connection.
+    """
+    with Client(parse_address(address), authkey=get_authkey()) as conn:
+        conn.send((os.path.abspath(input_folder), os.path.abspath(output_folder)))
+        status, message = conn.recv()
+
+    if status != "ok":
+        raise RuntimeError(f"Mask server failed: {message}")
+
+def reply(conn, message):
+    """Sends message to a client; a client that already hung up only loses its answer."""
+    try:
+        conn.send(message)
+    except OSError as e:  # BrokenPipeError, ConnectionResetError, ...
+        print(f"⚠️ Client disconnected before the reply: {e}")
+
+def serve(address=DEFAULT_ADDRESS):
+    """
+    Loads and warms up the segmentation model once, then serves
+    (input_folder, output_folder) requests until sent "shutdown".
+    """
+    # Refuse to start without a private key
+    authkey = get_authkey()
+
+    # Imported here so clients don't pay for torch/ultralytics
+    from person_mask import load_model, process_images_in_folder
+
+    # load_model also runs one dummy inference, initializing CUDA and the engine's kernels
+    print("Loading segmentation model...")
+    load_model()
+
+    with Listener(parse_address(address), authkey=authkey) as listener:
+        print(f"✅ Mask server ready on {address}")
+
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as e:
+                # Wrong key or dropped handshake: reject the client, keep serving
+                print(f"⚠️ Rejected connection: {e}")
+                continue
+
+            with conn:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError) as e:
+                    print(f"⚠️ Client disconnected before sending a request: {e}")
+                    continue
+
+                if request == "shutdown":
+                    reply(conn, ("ok", None))
+                    break
+
+                try:
+                    input_folder, output_folder = request
+                    print(f"📌 Request: {input_folder} → {output_folder}")
+                    process_images_in_folder(input_folder, output_folder)
+                except Exception as e:
+                    print(f"❌ Request failed: {e}")
+                    reply(conn, ("error", str(e)))
+                else:
+                    reply(conn, ("ok", None))
+
+    print("🗑 Mask server stopped.")
+
+def shutdown(address=DEFAULT_ADDRESS):
+    """Asks a running mask server to exit."""
+    with Client(parse_address(address), authkey=get_authkey()) as conn:
+        conn.send("shutdown")
+        conn.recv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the YOLO mask model warm and serve mask requests.")
+    parser.add_argument("--address", type=str, default=DEFAULT_ADDRESS, help=f"host:port to listen on (default: {DEFAULT_ADDRESS})")
+    parser.add_argument("--shutdown", action="store_true", help="Stop a running server instead of starting one")
+
+    args = parser.parse_args()
+
+    if args.shutdown:
+        shutdown(args.address)
+    else:
+        serve(args.address)
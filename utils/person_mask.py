@@ -0,0 +1,232 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from ultralytics import YOLO
+from ultralytics.utils import ops
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# YOLO segmentation weights (auto-download if not available)
+MODEL_WEIGHTS = "yolo11x-seg.pt"  # Model supports instance segmentation
+
+# Inference settings for batched mask generation
+MASK_BATCH = 16   # Larger batches stop paying off and only cost GPU memory
+MASK_IMGSZ = 1024
+MASK_PREFETCH = 2  # Batches decoded ahead of the one on the GPU
+
+_model = None
+
+def load_model():
+    """
+    Load the segmentation model once, exporting it on first use.
+    On GPU a TensorRT FP16 engine is used; on CPU an ONNX export.
+    Falls back to the PyTorch weights if the export fails (it is retried on
+    the next run) or the exported model cannot run (e.g. an engine built for
+    another GPU/TensorRT version).
+    """
+    global _model
+    if _model is not None:
+        return _model
+
+    if torch.cuda.is_available():
+        exported = os.path.splitext(MODEL_WEIGHTS)[0] + ".engine"
+        export_args = dict(format="engine", half=True, batch=MASK_BATCH, dynamic=True)
+    else:
+        exported = os.path.splitext(MODEL_WEIGHTS)[0] + ".onnx"
+        export_args = dict(format="onnx", batch=MASK_BATCH, dynamic=True)
+
+    if not os.path.exists(exported):
+        print(f"Exporting {MODEL_WEIGHTS} → {exported} (one-time)...")
+        try:
+            exported = YOLO(MODEL_WEIGHTS).export(imgsz=MASK_IMGSZ, **export_args)
+        except Exception as e:
+            print(f"⚠️ Export failed, using PyTorch weights: {e}")
+
+    if os.path.exists(exported):
+        try:
+            model = YOLO(exported, task="segment")
+            # One dummy inference: a stale engine only fails once it runs
+            model(np.zeros((MASK_IMGSZ, MASK_IMGSZ, 3), dtype=np.uint8), imgsz=MASK_IMGSZ, verbose=False)
+            _model = model
+            return _model
+        except Exception as e:
+            print(f"⚠️ Could not run {exported}, using PyTorch weights (delete it to re-export): {e}")
+
+    _model = YOLO(MODEL_WEIGHTS)
+    return _model
+
+def _merge_person_masks(masks):
+    """
+    Merge (N, h', w') person masks into one (h', w') mask (1 = person),
+    staying at model resolution.
+    """
+    return (masks > 0.5).any(0).to(torch.float32)
+
+_merge_fn = None
+_compile_errors = ()
+
+def merge_person_masks(masks):
+    """
+    Run _merge_person_masks compiled with torch.compile, so the threshold
+    and reduce steps fuse instead of launching one kernel each.
+    Falls back to eager mode when torch.compile is unavailable (torch < 2.0)
+    or fails to compile (e.g. no Triton on Windows). Other errors, such as
+    CUDA out of memory, are raised as usual.
+    """
+    global _merge_fn, _compile_errors
+    if _merge_fn is None:
+        if hasattr(torch, "compile"):
+            # Default mode: "reduce-overhead" would record a CUDA graph per detection count
+            _merge_fn = torch.compile(_merge_person_masks, fullgraph=True, dynamic=True)
+
+            from torch._dynamo.exc import TorchDynamoException
+            _compile_errors = (TorchDynamoException,)
+            try:
+                # Raised unwrapped by newer Inductor versions
+                from torch._inductor.exc import InductorError
+                _compile_errors += (InductorError,)
+            except ImportError:
+                pass
+        else:
+            _merge_fn = _merge_person_masks
+
+    if _merge_fn is _merge_person_masks:
+        return _merge_person_masks(masks)
+
+    try:
+        return _merge_fn(masks)
+    except _compile_errors as e:
+        print(f"⚠️ torch.compile failed, using eager mask post-processing: {e}")
+        _merge_fn = _merge_person_masks
+        return _merge_person_masks(masks)
+
+def build_mask_from_result(result, h, w):
+    """
+    Build a binary mask (background = 1, person = 0) of size (h, w)
+    from a single YOLO segmentation result.
+    """
+    if result.masks is None:
+        return np.ones((h, w), dtype=np.uint8)
+
+    # Indices of person detections (COCO class 0); a single host sync
+    person_idx = (result.boxes.cls.to(torch.int32) == 0).nonzero(as_tuple=True)[0]
+    if person_idx.numel() == 0:
+        return np.ones((h, w), dtype=np.uint8)
+
+    # Merge at model resolution first, so only one mask per image is upsampled
+    masks = result.masks.data.index_select(0, person_idx)
+    merged = merge_person_masks(masks)
+
+    # Crop the letterbox padding and upsample to the original image size
+    merged = ops.scale_masks(merged[None, None], (h, w))[0, 0]
+
+    # Background = 1, person = 0; copy back to the host once
+    return (merged <= 0.5).to(torch.uint8).cpu().numpy()
+
+def save_mask(save_path, final_mask):
+    """
+    Save a binary mask (0 = black for person, 255 = white for background).
+    Written as a 1-bit image: PNG encoding is much faster and files are ~8x
+    smaller, and readers still get 0/255 when converting to grayscale.
+    """
+    Image.fromarray(final_mask.astype(bool)).save(save_path, compress_level=1)
+
+def person_masks_batch(image_paths, output_folder, batch=MASK_BATCH):
+    """
+    Generate person masks for many images, running the model on
+    `batch` images per forward pass. Masks are saved as mask_{filename}.
+
+    Images are decoded and masks are written on a thread pool, so disk
+    I/O and PNG encode/decode overlap with GPU inference.
+    """
+    batch = min(batch, MASK_BATCH)
+    use_cuda = torch.cuda.is_available()
+    chunks = iter([image_paths[i:i + batch] for i in range(0, len(image_paths), batch)])
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        # Batches whose images are being decoded ahead of the model
+        pending = deque()
+
+        def prefetch_next():
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append((chunk, [pool.submit(cv2.imread, p) for p in chunk]))
+
+        for _ in range(MASK_PREFETCH):
+            prefetch_next()
+
+        writes = []
+        done = 0
+        while pending:
+            chunk, reads = pending.popleft()
+            prefetch_next()
+
+            loaded = []
+            for image_path, read in zip(chunk, reads):
+                img = read.result()
+                if img is None:
+                    print(f"⚠️ Could not read image: {image_path}")
+                    continue
+                loaded.append((image_path, img))
+
+            if loaded:
+                results = load_model()(
+                    [img for _, img in loaded],
+                    imgsz=MASK_IMGSZ,
+                    device=0 if use_cuda else "cpu",
+                    half=use_cuda,
+                    verbose=False,
+                )
+
+                for (image_path, _), r in zip(loaded, results):
+                    h, w = r.orig_shape
+                    final_mask = build_mask_from_result(r, h, w)
+
+                    # Save mask image (0 = black for person, 255 = white for background)
+                    filename = os.path.basename(image_path)
+                    save_path = os.path.join(output_folder, f"mask_{filename}")
+                    writes.append(pool.submit(save_mask, save_path, final_mask))
+
+            done += len(chunk)
+            print(f"Processed {done}/{len(image_paths)} images")
+
+        # Surface any write errors
+        for write in writes:
+            write.result()
+
+def person_mask(image_path, save_path="mask.png"):
+    # Read image
+    img = cv2.imread(image_path)
+    h, w = img.shape[:2]
+
+    # Run inference
+    results = load_model()(img, imgsz=MASK_IMGSZ)
+
+    final_mask = build_mask_from_result(results[0], h, w)
+
+    # Save mask image (0 = black for person, 255 = white for background)
+    save_mask(save_path, final_mask)
+
+    return final_mask
+
+def process_images_in_folder(input_folder, output_folder):
+    # Ensure output folder exists
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Collect all image files in the folder
+    with os.scandir(input_folder) as it:
+        image_paths = [
+            entry.path
+            for entry in it
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS)  # Only process image files
+        ]
+
+    # Generate segmentation masks in batches
+    print(f"Processing {len(image_paths)} images...")
+    person_masks_batch(image_paths, output_folder)
+
+    print("All masks are generated and saved.")
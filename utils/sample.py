@@ -2,56 +2,75 @@ import os
 import shutil
 import argparse # Library for parsing command-line arguments
 
+# Supported image formats
+VALID_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tiff', '.gif')
+
+def link_or_copy(src_path, dst_path):
+    """
+    Hard-link src_path to dst_path, overwriting an existing target.
+    Falls back to a regular copy when linking is not possible (e.g. across drives).
+    The link/copy is made under a temporary name and then swapped in, so an
+    existing target is never removed before its replacement exists.
+    """
+    # Same folder (or already linked): nothing to do, and never touch the source
+    if os.path.exists(dst_path) and os.path.samefile(src_path, dst_path):
+        return
+
+    tmp_path = dst_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)  # Leftover from an interrupted run
+    try:
+        os.link(src_path, tmp_path)
+    except OSError:
+        shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+
 def extract_images(source_folder, target_folder, step):
     """
     Extracts one image every 'step' images from the source folder and copies it to the target folder.
+    Files are hard-linked when possible, so no image data is duplicated.
     """
     
-    # 1. Define supported image formats
-    valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tiff', '.gif')
-
-    # 2. Check if source folder exists
+    # 1. Check if source folder exists
     if not os.path.exists(source_folder):
         print(f"❌ Error: Source folder not found: '{source_folder}'")
         return
 
-    # 3. Create target folder if it doesn't exist
+    # 2. Create target folder if it doesn't exist
     if not os.path.exists(target_folder):
         os.makedirs(target_folder)
         print(f"📂 Created new directory: {target_folder}")
     else:
         print(f"📂 Target directory already exists: {target_folder}")
 
-    # 4. Get and filter image files
+    # 3. Get, filter and sort image files in one pass (sorting is critical for consistent sampling)
+    #    Only image names are kept; other entries are dropped while scanning
     try:
-        all_files = os.listdir(source_folder)
+        with os.scandir(source_folder) as it:
+            image_files = sorted(entry.name for entry in it if entry.name.lower().endswith(VALID_EXTENSIONS))
     except Exception as e:
         print(f"❌ Error accessing source folder: {e}")
         return
-
-    image_files = [f for f in all_files if f.lower().endswith(valid_extensions)]
-    
-    # 5. Sort files (Critical for consistent sampling)
-    image_files.sort()
     
     total_images = len(image_files)
     if total_images == 0:
         print("⚠️ No image files found in the source folder.")
         return
 
-    # 6. Core logic: List slicing [start:end:step]
+    # 4. Core logic: List slicing [start:end:step], then release the full listing
     selected_images = image_files[::step]
+    del image_files
 
     print(f"📊 Found {total_images} images. Extracting {len(selected_images)} images (1 out of every {step})...")
 
-    # 7. Execute Copy
+    # 5. Execute Copy
     count = 0
     for filename in selected_images:
         src_path = os.path.join(source_folder, filename)
         dst_path = os.path.join(target_folder, filename)
         
         try:
-            shutil.copy2(src_path, dst_path)
+            link_or_copy(src_path, dst_path)
             count += 1
         except Exception as e:
             print(f"❌ Failed to copy {filename}: {e}")
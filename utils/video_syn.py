@@ -2,13 +2,28 @@ import cv2
 import os
 import argparse
 import re
-from collections import defaultdict
+import shutil
+import subprocess
+from collections import defaultdict, deque
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 # ================= DEFAULT CONFIGURATION =================
 DEFAULT_FPS = 10
+DECODE_WORKERS = 8    # Threads decoding frames for the OpenCV writer
+DECODE_PREFETCH = 16  # Frames decoded ahead of the writer
 # =======================================================
 
+VALID_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"})
+
+# [修改说明] 正则表达式已更新
+# 匹配逻辑：
+# 1. (pano_camera\d+) -> Group 1: 捕获 pano_camera 后跟数字 (例如 "pano_camera0")
+# 2. _frame_          -> 字面量匹配中间的 "_frame_"
+# 3. (\d+)            -> Group 2: 捕获帧编号数字 (例如 "00001")
+_FRAME_RE = re.compile(r"(pano_camera\d+)_frame_(\d+)")
+
 def parse_filename(filename):
     """
     Parses the filename to extract camera ID and iteration number.
@@ -19,12 +34,7 @@ def parse_filename(filename):
         camera_id (str): e.g., "pano_camera0"
         iteration (int): e.g., 1
     """
-    # [修改说明] 正则表达式已更新
-    # 匹配逻辑：
-    # 1. (pano_camera\d+) -> Group 1: 捕获 pano_camera 后跟数字 (例如 "pano_camera0")
-    # 2. _frame_          -> 字面量匹配中间的 "_frame_"
-    # 3. (\d+)            -> Group 2: 捕获帧编号数字 (例如 "00001")
-    match = re.search(r"(pano_camera\d+)_frame_(\d+)", filename)
+    match = _FRAME_RE.search(filename)
     
     if match:
         camera_id = match.group(1)  # e.g., pano_camera0
@@ -35,11 +45,12 @@ def parse_filename(filename):
 def get_grouped_images(directories):
     """
     Scans multiple directories, parses filenames, and groups them by Camera ID.
+    Each group is sorted by iteration, merging train and test images into a
+    single timeline based on frame number.
     
     Returns:
         dict: { "pano_camera0": [(iter, filepath), ...], "pano_camera1": [...] }
     """
-    valid_extensions = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
     grouped_files = defaultdict(list)
 
     for directory in directories:
@@ -48,35 +59,118 @@ def get_grouped_images(directories):
             continue
         
         print(f"Scanning directory: {directory} ...")
-        files = os.listdir(directory)
+        with os.scandir(directory) as it:
+            entries = list(it)
         
-        for f in files:
+        for entry in entries:
+            f = entry.name
             ext = os.path.splitext(f)[1].lower()
-            if ext in valid_extensions:
-                full_path = os.path.join(directory, f)
-                
+            if ext in VALID_EXTENSIONS:
                 # Parse the filename
                 camera_id, iteration = parse_filename(f)
                 
                 if camera_id is not None:
-                    # Store as tuple (iteration, full_path) for sorting later
-                    grouped_files[camera_id].append((iteration, full_path))
+                    # Store as tuple (iteration, full_path) for sorting below
+                    grouped_files[camera_id].append((iteration, entry.path))
                 else:
                     # Optional: Print warning if file doesn't match pattern
                     # print(f"Skipping non-matching file: {f}")
                     pass
 
+    # Sort each camera once by iteration (the first element of the tuple)
+    for image_data_list in grouped_files.values():
+        image_data_list.sort(key=itemgetter(0))
+
     return grouped_files
 
-def create_video_for_camera(camera_id, image_data_list, output_dir, fps):
+def reduced_imread_flag(src_width, dst_width):
     """
-    Generates a video for a specific camera, sorted by iteration.
+    Picks the cv2.imread flag that decodes at the largest reduction
+    (1/2, 1/4, 1/8) still at least as wide as dst_width, so large frames
+    are never fully materialized when the video is downscaled.
     """
-    # 1. Sort by iteration number (the first element of the tuple)
-    # This merges train and test images into a single timeline based on frame number
-    image_data_list.sort(key=lambda x: x[0])
-    
-    # Extract just the file paths after sorting
+    factor = src_width / dst_width
+    if factor >= 8:
+        return cv2.IMREAD_REDUCED_COLOR_8
+    if factor >= 4:
+        return cv2.IMREAD_REDUCED_COLOR_4
+    if factor >= 2:
+        return cv2.IMREAD_REDUCED_COLOR_2
+    return cv2.IMREAD_COLOR
+
+def iter_frames(image_paths, flags=cv2.IMREAD_COLOR):
+    """
+    Yields decoded frames in order while the next DECODE_PREFETCH frames
+    are decoded on a thread pool (cv2.imread releases the GIL).
+    Frames that fail to decode are yielded as None.
+    """
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool:
+        pending = deque()
+        paths = iter(image_paths)
+
+        for img_path in paths:
+            pending.append(pool.submit(cv2.imread, img_path, flags))
+            if len(pending) >= DECODE_PREFETCH:
+                break
+
+        while pending:
+            img = pending.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(pool.submit(cv2.imread, next_path, flags))
+            yield img
+
+def encode_with_ffmpeg(image_paths, output_path, fps, size):
+    """
+    Encodes the frames with a single ffmpeg process, using the concat demuxer
+    so decoding, scaling and encoding all happen inside ffmpeg.
+    Tries NVENC first and falls back to libx264.
+
+    Returns:
+        bool: True if ffmpeg produced the video.
+    """
+    width, height = size
+    list_path = output_path + ".frames.txt"
+
+    # Concat demuxer list; quotes in paths are escaped as '\''
+    entries = [os.path.abspath(p).replace("'", "'\\''") for p in image_paths]
+    with open(list_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(f"file '{entry}'\nduration {1.0 / fps:.6f}\n")
+        # The last duration is only honoured if the final file is listed again
+        f.write(f"file '{entries[-1]}'\n")
+
+    encoders = [
+        ["-c:v", "h264_nvenc"],
+        ["-c:v", "libx264", "-preset", "ultrafast"],
+    ]
+    try:
+        for encoder in encoders:
+            cmd = [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                # yuv420p needs even dimensions
+                "-vf", f"scale={width}:{height},pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-r", str(fps),
+                *encoder,
+                "-pix_fmt", "yuv420p",
+                output_path,
+            ]
+            if subprocess.run(cmd).returncode == 0:
+                return True
+            print(f"Warning: ffmpeg encoder {encoder[1]} failed.")
+    finally:
+        os.remove(list_path)
+
+    return False
+
+def create_video_for_camera(camera_id, image_data_list, output_dir, fps, max_width=None):
+    """
+    Generates a video for a specific camera.
+    image_data_list must already be sorted by iteration (see get_grouped_images).
+    If max_width is given, wider frames are downscaled (keeping aspect ratio).
+    """
+    # Extract just the file paths (already in timeline order)
     image_paths = [item[1] for item in image_data_list]
 
     if not image_paths:
@@ -92,14 +186,26 @@ def create_video_for_camera(camera_id, image_data_list, output_dir, fps):
     
     height, width, layers = first_img.shape
     size = (width, height)
+    if max_width and width > max_width:
+        size = (max_width, round(height * max_width / width))
+
+    if shutil.which("ffmpeg"):
+        print(f"Encoding Video with ffmpeg: {camera_id} ({len(image_paths)} frames)...")
+        if encode_with_ffmpeg(image_paths, output_path, fps, size):
+            print(f"Saved: {output_path}")
+            return
+        print("Falling back to OpenCV VideoWriter.")
 
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_path, fourcc, fps, size)
 
     print(f"Processing Video: {camera_id} ({len(image_paths)} frames)...")
     
-    for img_path in tqdm(image_paths, leave=False, desc=camera_id):
-        img = cv2.imread(img_path)
+    # When downscaling, decode at reduced resolution; the loop resizes to the exact size
+    flags = reduced_imread_flag(width, size[0])
+
+    frames = iter_frames(image_paths, flags)
+    for img in tqdm(frames, total=len(image_paths), leave=False, desc=camera_id):
         if img is None:
             continue
         
@@ -119,6 +225,7 @@ def parse_args():
     parser.add_argument("--test_dir", type=str, required=True, help="Path to testing images")
     parser.add_argument("--out_dir", type=str, required=True, help="Path to save output videos")
     parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help=f"Frames per second (default: {DEFAULT_FPS})")
+    parser.add_argument("--max_width", type=int, default=None, help="Downscale videos wider than this (default: keep frame size)")
     
     return parser.parse_args()
 
@@ -146,7 +253,8 @@ def main():
             camera_id, 
             grouped_data[camera_id], 
             args.out_dir, 
-            args.fps
+            args.fps,
+            args.max_width
         )
 
     print("\nAll videos processed successfully!")